@@ -1,20 +1,59 @@
 "Provides functionality to convert CSV file into *.sql PostgreSQL schema file"
 
+from functools import lru_cache as __lru_cache
 from os import path as __path
-from re import sub as __sub
+from re import compile as __compile
 import csv
 
-
+# pyarrow is an optional dependency; when it is installed the data rows are
+# parsed and escaped through its C++ csv reader, which is considerably faster
+# than the stdlib csv module, otherwise the pure-Python path is used
+try:
+    import pyarrow as _pa
+    from pyarrow import csv as _pa_csv
+    from pyarrow import compute as _pa_compute
+except ImportError:
+    _pa = None
+
+# pandas is likewise optional; its C csv parser serves as the chunked
+# middle ground for the data rows when pyarrow is not installed
+try:
+    import pandas as _pd
+except ImportError:
+    _pd = None
+
+# the single quote and its postgreSQL-escaped form, precomputed once so that
+# the per-cell escaping loop does not rebuild these literals on every call
+SQ = "'"
+SQ2 = "''"
+
+# stands in for the cell boundaries while a whole row is escaped in one go;
+# rows whose cells actually contain it are escaped cell by cell instead
+_SENTINEL = '\x01'
+
+# compiled once at import so that name sanitising does not go through the
+# re module's compile cache lookup on every call
+_NAME_RE = __compile(r'[\s-]')
+
+# 1 MiB buffer for the csv reads and the sql write; the default buffer of a
+# few KiB costs far more syscalls than necessary on large sequential files
+_BUFFER_SIZE = 1 << 20
+
+
+@__lru_cache(maxsize=1024)
 def filename(file_path: str):
     '''
     Returns the name of the file whose path has been passed
+
+    The result is cached since the same path tends to be passed repeatedly,
+    e.g. across the files of a batch job, making repeat calls a dict lookup
     '''
 
     # uses the os.path function to extract the name of the file
     name = __path.basename(file_path).split('.')[0].lower()
 
     # returns the name of the file with any whitespace/hypen converted to an underscore
-    return __sub(r'[\s-]', '_', name)
+    return _NAME_RE.sub('_', name)
 
 
 def _get_header(
@@ -25,7 +64,10 @@ def _get_header(
     '''
 
     # opens the file and then loads the file using csv.reader so that it can iterated over
-    with open(file_path, newline='', encoding=__encoding) as csvfile:
+    # csv.reader keeps the names verbatim - duplicate or empty ones included -
+    # exactly as the main conversion path reads them
+    with open(file_path, newline='',
+              encoding=__encoding, buffering=_BUFFER_SIZE) as csvfile:
         reader = csv.reader(csvfile)
 
         # next() reads the next row, in this case the header row
@@ -65,14 +107,72 @@ def _column_def(header: list) -> str:
     return '\t' + ', \n\t'.join(temp)
 
 
-def _values_str(
-        file_path: str,
-        __encoding: str = 'utf-8') -> str:
+def _table_str(schema_name: str, table_name: str, header: list) -> str:
+    '''
+    Returns the table creation part of the output, i.e. the DROP TABLE
+    statement followed by the CREATE TABLE statement with its column definition
+    '''
+
+    drop_string = f'''DROP TABLE IF EXISTS {schema_name}.{table_name}'''
+    create_string = f'''CREATE TABLE {schema_name}.{table_name}'''
+    definition_string = _column_def(header)
+
+    return f'''{drop_string};\n{create_string} (\n{definition_string}\n)'''
+
+
+def _row_values(row: list) -> str:
     '''
-    Converts all the raw data into a easy-to-read, well-fromatted,
-    postgreSQL syntax for inserting data.
+    Joins the cells of one csv row into the inner part of a postgreSQL value
+    tuple, escaping quotes with a single replace call over the whole row
+    '''
+
+    # the cells are joined with the sentinel so that the quote escaping runs
+    # as one C-level pass per row instead of one Python call per cell
+    cells = _SENTINEL.join(row)
 
-    . . . 
+    # a cell that itself contains the sentinel would be torn apart by the
+    # delimiter rewrite below - such rows show up as a surplus of sentinels
+    # after the join and take the per-cell path instead, so the output stays
+    # identical to the pyarrow/pandas writers for any input
+    if cells.count(_SENTINEL) != len(row) - 1:
+        return "', '".join(
+            c.replace(SQ, SQ2) if SQ in c else c for c in row)
+
+    if SQ in cells:
+        cells = cells.replace(SQ, SQ2)
+
+    # a second C-level pass turns the sentinels into the tuple delimiter
+    return cells.replace(_SENTINEL, "', '")
+
+
+def _tuple_lead(count: int, insert_prefix: str, rows_per_insert: int) -> str:
+    '''
+    Returns what goes in front of the value tuple with the given row count:
+    just the indentation for the first row of a statement, the plain delimiter
+    otherwise, and a statement break (closing the current INSERT and opening
+    the next one) every rows_per_insert rows
+    '''
+
+    if count == 0:
+        return "\n\t"
+
+    if count % rows_per_insert == 0:
+        return ";\n\n" + insert_prefix + "\n\t"
+
+    return ", \n\t"
+
+
+def _write_values(
+        reader,
+        output,
+        insert_prefix: str,
+        rows_per_insert: int) -> None:
+    '''
+    Streams the remaining rows of an already-opened csv reader as easy-to-read,
+    well-fromatted, postgreSQL value tuples into the given output file,
+    starting a fresh INSERT statement every rows_per_insert rows.
+
+    . . .
 
         (...'foo', 'bar', 'baz',...),
 
@@ -84,33 +184,109 @@ def _values_str(
     . . .
     '''
 
-    with open(file_path, newline='', encoding=__encoding) as csvfile:
-        reader = csv.reader(csvfile)
+    # each row becomes ('item1', 'item2', 'item3',...) as a string
+    # and if there is any ' character it will be replaced with '' since that is how
+    # postgreSQL works like ('foo's bar' -> 'foo''s bar')
+    # _row_values does the quoting with one replace per row, not per cell
+    output.write(insert_prefix)
+
+    # writelines drives the rows from C, which avoids one interpreter-level
+    # loop iteration and write() dispatch per row
+    output.writelines(
+        _tuple_lead(count, insert_prefix, rows_per_insert)
+        + "('" + _row_values(row) + "')"
+        for count, row in enumerate(reader))
+
+
+def _write_values_arrow(
+        file_path: str,
+        header: list,
+        write,
+        insert_prefix: str,
+        rows_per_insert: int,
+        __encoding: str = 'utf-8') -> None:
+    '''
+    pyarrow-backed version of _write_values. Reads the csv in record batches
+    through pyarrow's C++ parser and escapes the quotes of a whole batch at a
+    time with a vectorized replace, instead of one Python call per cell
+    '''
+
+    # a large block size keeps the number of batches (and so the per-batch
+    # Python overhead) low while still bounding memory to one batch
+    read_options = _pa_csv.ReadOptions(block_size=16 << 20, encoding=__encoding)
+
+    # arrow rejects newlines inside quoted cells by default, which the other
+    # paths accept - valid csv must parse the same on every path
+    parse_options = _pa_csv.ParseOptions(newlines_in_values=True)
+
+    # every column is read back as a plain string so that the values end up
+    # in the output exactly as they appear in the file, with no type
+    # inference, and empty cells stay empty strings instead of becoming null
+    convert_options = _pa_csv.ConvertOptions(
+        column_types={name: _pa.string() for name in header},
+        null_values=[])
+
+    write(insert_prefix)
+    count = 0
+
+    with _pa_csv.open_csv(file_path, read_options=read_options,
+                          parse_options=parse_options,
+                          convert_options=convert_options) as batches:
+
+        for batch in batches:
+
+            # the quote escaping runs once per column over the whole batch
+            # inside arrow's C layer rather than once per cell in Python
+            escaped = [
+                _pa_compute.replace_substring(
+                    column, pattern=SQ, replacement=SQ2).to_pylist()
+                for column in batch.columns
+            ]
+
+            # zips the escaped columns back into rows and writes them in the
+            # same format as the pure-Python path
+            for row in zip(*escaped):
 
-        # moves the row with one increment so that in the next for loop
-        # data starts after the header row
-        next(reader)
+                write(_tuple_lead(count, insert_prefix, rows_per_insert)
+                      + "('" + "', '".join(row) + "')")
+                count += 1
 
-        # after the necessary formatting of each element, they will be stored in this temporary
-        # list which will then be joined together in order to get the desired formatted result
-        format_string = []
 
-        # goes through all the rows of csv file and formats the value in each row
-        for row in reader:
+def _write_values_pandas(
+        file_path: str,
+        output,
+        insert_prefix: str,
+        rows_per_insert: int,
+        __encoding: str = 'utf-8') -> None:
+    '''
+    pandas-backed version of _write_values. Reads the csv in chunks through
+    pandas' C parser and escapes/wraps the quotes of a whole chunk at a time
+    with vectorized string methods, instead of one Python call per cell
+    '''
+
+    # dtype=str with the na filter off keeps every value exactly as it is in
+    # the file, empty cells included, with no NaN conversion
+    chunks = _pd.read_csv(
+        file_path, chunksize=50_000, dtype=str,
+        keep_default_na=False, na_filter=False, encoding=__encoding)
 
-            # the output will be (item1, item2, item3,...) as a string
-            # such that each transformation will be like (item -> 'item')
-            # and if there is any ' character it will be replaced with '' since that is how
-            # postgreSQL works like ('foo's bar' -> 'foo''s bar')
-            tmp = ", ".join(
-                [f"""'{str(item).replace("'", "''")}'""" for item in row])
+    output.write(insert_prefix)
+    count = 0
 
-            # lastly the values inside the tmp string are concatenated for the required SQL's
-            # syntax additionals and appended to the format_string list
-            format_string.append("\n\t(" + tmp + ")")
+    for chunk in chunks:
 
-    # joins all the items inside the format_string list, using a ', ' delimiter
-    return ", ".join(format_string)
+        # the quote escaping and wrapping run per column over the whole
+        # chunk inside pandas' C string routines
+        quoted = chunk.apply(
+            lambda col: "'" + col.str.replace(SQ, SQ2, regex=False) + "'")
+
+        # the cells are already quoted, so the rows only need joining and
+        # the same delimiter handling as the other paths
+        for row in quoted.itertuples(index=False, name=None):
+
+            output.write(_tuple_lead(count, insert_prefix, rows_per_insert)
+                         + "(" + ", ".join(row) + ")")
+            count += 1
 
 
 def csv_postgresql(
@@ -119,11 +295,23 @@ def csv_postgresql(
         table_name: str = "",
         schema_only: bool = False,
         schema_only_name: str = 'schema_only.sql',
+        mode: str = 'copy',
+        rows_per_insert: int = 10_000,
         __encoding: str = 'utf-8') -> None:
     '''
     Converts the csv file into a PostgreSQL *.sql file such that the file contains
     schema creation, table creation, and data loading procedure.
 
+    With mode='copy' (the default) the data is loaded through a COPY ... FROM
+    STDIN block with the csv streamed through untouched - the server's C
+    parser handles all the quoting, which is several times faster than INSERT
+    for bulk loads; every column is marked FORCE_NOT_NULL so that empty cells
+    load as empty strings, exactly as they do through the INSERT output.
+    mode='insert' keeps the INSERT ... VALUES output, split
+    into statements of at most rows_per_insert rows each, since a single
+    unbounded statement with millions of tuples is very hard on the server's
+    parser.
+
     ________________________________________________________
 
     CREATE SCHEMA foo
@@ -150,65 +338,116 @@ def csv_postgresql(
         (..'foo','bar',...);
     '''
 
+    # fails early on an unknown mode rather than after the schema is written
+    if mode not in ('copy', 'insert'):
+        raise ValueError("mode must be either 'copy' or 'insert'")
+
+    # the file name is needed for the default schema/table names and for the
+    # output file name, so it is computed once instead of up to three times
+    _default_name = filename(file)
+
     # if the schema/table name is not given then sets the name to file name
     # if given, then as a fail safe measure, removes whitespace and hypen characters from the names
 
     # for schema_name:
     if len(schema_name) == 0:
-        schema_name = filename(file)
+        schema_name = _default_name
     else:
 
         # replaces any whitespace/hyphen character with underscore
-        schema_name = __sub(r'[\s-]', '_', schema_name).lower()
+        schema_name = _NAME_RE.sub('_', schema_name).lower()
 
     # for table_name:
     if len(table_name) == 0:
-        table_name = filename(file)
+        table_name = _default_name
     else:
 
         # replaces any whitespace/hyphen character with underscore
-        table_name = __sub(r'[\s-]', '_', table_name).lower()
-
-    # fetches the header row of the csv
-    header = _get_header(file)
-
-    # SCHEMA - TABLE - INSERT
-    # schema:
-    _schema = f'''CREATE SCHEMA {schema_name}'''
-
-    # table:
-    drop_string = f'''DROP TABLE IF EXISTS {schema_name}.{table_name}'''
-    create_string = f'''CREATE TABLE {schema_name}.{table_name}'''
-    definition_string = _column_def(header)
-
-    _table = f'''{drop_string};\n{create_string} (\n{definition_string}\n)'''
+        table_name = _NAME_RE.sub('_', table_name).lower()
 
     # giving the option to just transform the csv into a create table statement
+    # only the header row is needed here, so the data rows are never read
     if schema_only:
 
-        _schema_only = f'''{_schema};\n\n{_table};'''
+        header = _get_header(file)
 
         with open(schema_only_name, 'w', encoding=__encoding) as output:
-            output.write(_schema_only)
+            output.write(f'''CREATE SCHEMA {schema_name};\n\n''')
+            output.write(f'''{_table_str(schema_name, table_name, header)};''')
 
         return None
 
-    # insert:
-    main_string = f'''INSERT INTO {schema_name}.{table_name}'''
-
-    columns_string = ', '.join(
-        [f'"{item}"' for item in header])
-
-    values_string = _values_str(file)
-
-    _insert = f'''{main_string}\n\t({columns_string})\nVALUES{values_string}'''
+    # SQL FILE WRITING
+    # the csv is opened once and kept open so that the header can be read
+    # first and the data rows streamed straight into the output file, instead
+    # of building the whole INSERT statement as one giant in-memory string
 
-    # OUTPUT STRING
-    ouput_string = f'''{_schema};\n\n{_table};\n\n{_insert};'''
+    output_name = _default_name + '.sql'
 
-    # SQL FILE WRITING
+    with open(file, newline='',
+              encoding=__encoding, buffering=_BUFFER_SIZE) as csvfile:
+        reader = csv.reader(csvfile)
 
-    output_name = filename(file) + '.sql'
+        # next() reads the next row, in this case the header row
+        # header is a list storing names of all the columns which the data contains
+        header = next(reader)
 
-    with open(output_name, 'w', encoding=__encoding) as output:
-        output.write(ouput_string)
+        columns_string = ', '.join(
+            [f'"{item}"' for item in header])
+
+        with open(output_name, 'w',
+                  encoding=__encoding, buffering=_BUFFER_SIZE) as output:
+
+            # SCHEMA - TABLE sections, written one at a time before any
+            # data row, so no combined copy of them is ever built
+            output.write(f'''CREATE SCHEMA {schema_name};\n\n''')
+            output.write(f'''{_table_str(schema_name, table_name, header)};\n\n''')
+
+            if mode == 'copy':
+
+                # the csv bytes are streamed through as they are, header
+                # included - the server's C-level COPY parser handles all the
+                # quoting, so no per-cell work happens in Python at all.
+                # FORCE_NOT_NULL on every column keeps empty cells as empty
+                # strings, matching the INSERT output; csv-mode COPY would
+                # otherwise load them as NULL
+                output.write(
+                    f'''COPY {schema_name}.{table_name}\n\t({columns_string})\n'''
+                    f'''FROM STDIN WITH (FORMAT csv, HEADER true, '''
+                    f'''FORCE_NOT_NULL ({columns_string}));\n''')
+
+                csvfile.seek(0)
+                last = '\n'
+
+                while True:
+                    chunk = csvfile.read(_BUFFER_SIZE)
+                    if not chunk:
+                        break
+                    output.write(chunk)
+                    last = chunk[-1]
+
+                # COPY data has to end on its own line before the terminator
+                if last != '\n':
+                    output.write('\n')
+
+                output.write('\\.\n')
+                return None
+
+            # the INSERT prefix is handed to the writer, which re-emits it
+            # whenever it starts a fresh statement
+            insert_prefix = (
+                f'''INSERT INTO {schema_name}.{table_name}\n\t({columns_string})\nVALUES''')
+
+            # the value tuples are streamed row by row, so peak memory stays
+            # at the size of a single row (one batch/chunk for the C-backed
+            # parsers) rather than the whole file
+            if _pa is not None:
+                _write_values_arrow(file, header, output.write,
+                                    insert_prefix, rows_per_insert, __encoding)
+            elif _pd is not None:
+                _write_values_pandas(file, output,
+                                     insert_prefix, rows_per_insert, __encoding)
+            else:
+                _write_values(reader, output, insert_prefix, rows_per_insert)
+
+            output.write(';')
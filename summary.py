@@ -2,19 +2,51 @@
 Provides functionality to get statistics much like that
 of pd.Dataframe.info()
 '''
+from concurrent.futures import ThreadPoolExecutor
+from os import cpu_count
+import warnings
+
 import pandas as pd
 import numpy as np
 
+# minimum number of verbose columns before the per-column unique counts are
+# farmed out to a thread pool; below this the pool overhead is not worth it
+_PARALLEL_THRESHOLD = 8
+
 
-def _percentile_count(series: pd.Series, percentile_value: float = None) -> int:
+def _percentile_counts(values: np.ndarray, thresholds) -> tuple:
     '''
-    Returns the unique count of values for given series & percentile value
+    Returns the unique count of values below each of the given percentile
+    values, sharing a single sort of the column across all the thresholds
     '''
-    if percentile_value is None:
-        raise ValueError("percentile_value cannot be None")
 
-    # retains the values where the values is in the percentile range and counts unique values
-    return len(series[series < percentile_value].unique())
+    # NaNs never sit below a threshold, so they are dropped up front, then
+    # the remaining values are sorted once, in place on the masked copy
+    values = values[~np.isnan(values)]
+    values.sort()
+
+    if values.size == 0:
+        return tuple(0 for _ in thresholds)
+
+    # running count of unique values up to each sorted position - a new
+    # unique value starts wherever an element differs from its predecessor
+    unique_cum = np.cumsum(
+        np.concatenate(([True], values[1:] != values[:-1])))
+
+    counts = []
+
+    for threshold in thresholds:
+
+        # nothing compares below NaN
+        if np.isnan(threshold):
+            counts.append(0)
+            continue
+
+        # everything before this index sits strictly below the threshold
+        idx = np.searchsorted(values, threshold, side='left')
+        counts.append(int(unique_cum[idx - 1]) if idx else 0)
+
+    return tuple(counts)
 
 
 def _disjoint(a, b):
@@ -22,7 +54,9 @@ def _disjoint(a, b):
     Returns False if atleast both have atleast one value in common
     '''
 
-    return set(a).isdisjoint(set(b))
+    # isdisjoint accepts any iterable as its argument, only the receiver has
+    # to be a set, so the second set construction is skipped
+    return set(a).isdisjoint(b)
 
 
 def dataframe_info(
@@ -48,55 +82,57 @@ def dataframe_info(
     "95th Percentile - Unique Count"
     '''
 
+    # the membership tests below run once per column, so the argument lists
+    # are converted to sets up front to make each test O(1)
+    skip_set = set(to_skip_cols or ())
+    verbose_set = set(verbose_cols or ())
+    unique_set = set(unique_count_cols or ())
+
     # Basic checks to ensure arguments are passed correctly.
     # Checks if the any of the verbose/unique columns arg is passed
     # and that the values inside do not have overlapping values in
     # to_skip_cols argument as well
     if to_skip_cols is not None:
 
-        if (verbose_cols is not None) and not _disjoint(to_skip_cols, verbose_cols):
+        if (verbose_cols is not None) and not _disjoint(skip_set, verbose_cols):
             raise ValueError(
                 "Column(s) in 'verbose_cols' are also in 'to_skip_cols'")
 
-        if (unique_count_cols is not None) and not _disjoint(to_skip_cols, unique_count_cols):
+        if (unique_count_cols is not None) and not _disjoint(skip_set, unique_count_cols):
             raise ValueError(
                 "Column(s) in 'unique_count_cols' are also in 'to_skip_cols'")
 
-        # creates a list of the columns values and removes the ones that need to be skipped
-        columns = list(df.columns)
-
-        for col in to_skip_cols:
-            columns.remove(col)
+    # creates a list of the columns values without the ones that need to be
+    # skipped, in a single pass; with no skips this keeps every column, so
+    # calling without to_skip_cols works instead of raising UnboundLocalError
+    columns = [col for col in df.columns if col not in skip_set]
 
     # summary will be a dictionary set up in such a way that it will finally be passed
     # to pd.Dataframe() as argument in order to return a dataframe as output.
     summary: dict[str, list] = {'Columns': columns}
 
     # returns the datatype of each column as interpreted by the pandas engine
-    # str() here returns the result of __str__()
-    summary['Data Type']: list = [
-        str(df[col].dtype) for col in columns
-    ]
+    # df.dtypes covers every column in one call, astype(str) then gives the
+    # same strings that str(dtype) would
+    summary['Data Type']: list = df.dtypes.astype(str).loc[columns].tolist()
 
     # returns the non-null count of values for each column
-    summary['Non-Null Count'] = [
-        df[col].dropna().count() for col in columns
-    ]
-
-    # If the unique_count_cols is not empty, then it goes through a for loop
-    # for all the columns in columns-list.
-    # Then, if columns is found in unique_columns list, it returns a count of
-    # unique values else returns NaN.
+    # df.count() computes all the counts in a single vectorized call instead
+    # of one dropna() copy per column
+    summary['Non-Null Count'] = df.count().loc[columns].tolist()
+
+    # If the unique_count_cols is not empty, the counts are scattered into a
+    # NaN-filled array at the relevant columns' positions - the same two-pass
+    # pattern as the verbose statistics below, with no per-column branching
     if unique_count_cols is not None:
-        summary['Unique Count']: list = [
-            len(df[col].unique()) if col in unique_count_cols else np.nan for col in columns]
 
-        # for col in columns:
+        unique_idx = [i for i, col in enumerate(columns) if col in unique_set]
+
+        unique_counts = np.full(len(columns), np.nan, dtype=float)
+        unique_counts[unique_idx] = [
+            df[columns[i]].nunique(dropna=False) for i in unique_idx]
 
-        #     if col in unique_count_cols:
-        #         summary['Unique Count'].append(len(df[col].unique()))
-        #     else:
-        # summary['Unique Count'].append(np.nan)
+        summary['Unique Count'] = unique_counts
 
     # if verbose columns list is not None, then returns the detailed statistics for these columns
     if verbose_cols is not None:
@@ -107,59 +143,76 @@ def dataframe_info(
                             '90th Percentile - Unique Count', '95th Percentile',
                             '95th Percentile - Unique Count']
 
-        # initializes a list for each of the item in statistics list as key in summary dict
+        # each statistic gets a preallocated NaN-filled array the size of the
+        # columns list, so the non-verbose columns need no per-column Python
+        # work at all - they simply keep their NaN slots
         for item in statistics:
-            summary[item]: list = []
-
-        # goes through each of the columns in the list and then if column is in verbose' list
-        # it computes the detailed statistics
-        for i, col in enumerate(columns):
-
-            if col in verbose_cols:
-
-                # returns the minimum and maximum values
-                summary['Minimum'].append(df[col].min())
-                summary['Maximum'].append(df[col].max())
-
-                # returns the average/mean and median values
-                summary['Mean'].append(df[col].mean())
-                summary['Median'].append(df[col].quantile())
-
-                # returns the 75th percentile value & unique count of values in the
-                # 75th percentile range
-                summary['75th Percentile'].append(df[col].quantile(0.75))
-                summary['75th Percentile - Unique Count'].append(
-                    _percentile_count(
-                        series=df[col],
-                        percentile_value=summary['75th Percentile'][i]
-                    )
-                )
-
-                # returns the 90th percentile value & unique count of values in the
-                # 90th percentile range
-                summary['90th Percentile'].append(df[col].quantile(0.90))
-                summary['90th Percentile - Unique Count'].append(
-                    _percentile_count(
-                        series=df[col],
-                        percentile_value=summary['90th Percentile'][i]
-                    )
-                )
-
-                # returns the 95th percentile value & unique count of values in the
-                # 95th percentile range
-                summary['95th Percentile'].append(df[col].quantile(0.95))
-                summary['95th Percentile - Unique Count'].append(
-                    _percentile_count(
-                        series=df[col],
-                        percentile_value=summary['95th Percentile'][i]
-                    )
-                )
-
-            # if the column is not in the verbose' list then it return a NaN
-            else:
-
-                for item in statistics:
-                    summary[item].append(np.nan)
+            summary[item] = np.full(len(columns), np.nan, dtype=float)
+
+        # positions of the verbose columns inside the filtered columns list;
+        # the computed statistics are scattered into the arrays at these spots
+        verbose_idx = [i for i, col in enumerate(columns) if col in verbose_set]
+        v_cols = [columns[i] for i in verbose_idx]
+
+        # the verbose columns are pulled out as a single numpy block so that
+        # every statistic below runs as a direct NaN-aware numpy reduction
+        # over all columns at once, skipping the per-call dtype and
+        # NaN-handling dispatch of the equivalent pandas methods
+        v_arr = df[v_cols].to_numpy(dtype=float)
+
+        # a zero-row frame (or no verbose columns at all) would make the
+        # reductions below raise, and an all-NaN column makes them warn -
+        # cases where the pandas methods returned NaN silently, so the NaN
+        # defaults are simply kept and the warnings scoped out
+        if v_arr.size:
+
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+
+                # the minimum, maximum and mean rows are scattered into the
+                # preallocated arrays in one assignment per statistic
+                summary['Minimum'][verbose_idx] = np.nanmin(v_arr, axis=0)
+                summary['Maximum'][verbose_idx] = np.nanmax(v_arr, axis=0)
+                summary['Mean'][verbose_idx] = np.nanmean(v_arr, axis=0)
+
+                # all the quantiles (median included) come out of a single
+                # call, so each column is sorted once instead of once per
+                # quantile
+                q50, q75, q90, q95 = np.nanpercentile(
+                    v_arr, [50, 75, 90, 95], axis=0)
+
+            summary['Median'][verbose_idx] = q50
+            summary['75th Percentile'][verbose_idx] = q75
+            summary['90th Percentile'][verbose_idx] = q90
+            summary['95th Percentile'][verbose_idx] = q95
+
+        else:
+
+            # NaN thresholds match an empty column below nothing, so the
+            # unique counts further down come out as zero, as they always did
+            q75 = q90 = q95 = np.full(len(v_cols), np.nan)
+
+        # the unique counts within each percentile range still need one sort
+        # per verbose column, shared across the three thresholds; the columns
+        # are independent of each other so they parallelize cleanly
+        def _unique_counts(pos):
+            return _percentile_counts(
+                v_arr[:, pos], (q75[pos], q90[pos], q95[pos]))
+
+        # for wide frames the counts are computed in a thread pool - the
+        # sort, cumsum and searchsorted calls underneath release the GIL, so
+        # the threads genuinely run side by side
+        if len(v_cols) >= _PARALLEL_THRESHOLD:
+            with ThreadPoolExecutor(max_workers=cpu_count()) as pool:
+                counts = list(pool.map(_unique_counts, range(len(v_cols))))
+        else:
+            counts = [_unique_counts(pos) for pos in range(len(v_cols))]
+
+        # scatters the counts into the preallocated slots
+        for i, (count75, count90, count95) in zip(verbose_idx, counts):
+            summary['75th Percentile - Unique Count'][i] = count75
+            summary['90th Percentile - Unique Count'][i] = count90
+            summary['95th Percentile - Unique Count'][i] = count95
 
     # returns the summary dictionary as a dataframe
     return pd.DataFrame(summary)